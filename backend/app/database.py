@@ -1,15 +1,22 @@
 import os
+import uuid
 import psycopg
+from psycopg.rows import dict_row
 from contextlib import contextmanager
 from pathlib import Path
 from dotenv import load_dotenv
 
+from app.utils import is_valid_uuid
+
 # Cargar variables de entorno
 env_path = Path(__file__).parent.parent / '.env'
 load_dotenv(dotenv_path=env_path)
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# Se activa en init_db si media_store es una tabla particionada
+PARTITIONED = False
+
 @contextmanager
 def get_db_connection():
     """Context manager para conexiones a la base de datos"""
@@ -28,8 +35,29 @@ def get_db_connection():
 
 def init_db():
     """Inicializa la base de datos y crea la tabla si no existe"""
+    global PARTITIONED
+    from app import partitioning
+
     with get_db_connection() as conn:
-        with conn.cursor() as cur:
+        with conn.cursor(row_factory=dict_row) as cur:
+            cur.execute("SELECT to_regclass('media_store') IS NOT NULL AS present")
+            exists = cur.fetchone()['present']
+
+            # Instalación nueva con particionado activado
+            if partitioning.PARTITIONING_ENABLED and not exists:
+                partitioning.create_partitioned_schema(cur)
+
+            if partitioning.is_partitioned_table(cur):
+                PARTITIONED = True
+                partitioning.ensure_partitions(cur)
+                return
+
+            if partitioning.PARTITIONING_ENABLED:
+                print(
+                    "MEDIA_PARTITIONING=true pero media_store no está particionada. "
+                    "Ejecuta 'python -m app.partitioning migrate' para migrarla."
+                )
+
             # Crear tabla base
             cur.execute("""
                 CREATE TABLE IF NOT EXISTS media_store (
@@ -78,6 +106,65 @@ def init_db():
                 CREATE INDEX IF NOT EXISTS idx_media_short_id ON media_store(short_id);
             """)
 
+def media_key(record):
+    """
+    Condición WHERE que identifica un archivo en media_store.
+
+    En el esquema particionado incluye created_at para que la consulta
+    toque una sola partición.
+
+    Returns:
+        tuple[str, tuple]: Fragmento SQL y sus parámetros
+    """
+    if PARTITIONED:
+        return "id = %s AND created_at = %s", (record['id'], record['created_at'])
+    return "id = %s", (record['id'],)
+
+
+def _lookup(cur, table: str, select: str, resource_id: str, lookup_short_id: bool):
+    """Busca por short_id y, si no existe, por UUID en la tabla indicada"""
+    record = None
+    if lookup_short_id:
+        cur.execute(f"SELECT {select} FROM {table} WHERE short_id = %s", (resource_id,))
+        record = cur.fetchone()
+
+    # Fallback: buscar por UUID si el formato es válido
+    if not record and is_valid_uuid(resource_id):
+        try:
+            file_uuid = uuid.UUID(resource_id)
+        except ValueError:
+            return None
+        cur.execute(f"SELECT {select} FROM {table} WHERE id = %s", (file_uuid,))
+        record = cur.fetchone()
+
+    return record
+
+
+def find_media(cur, resource_id: str, columns: str = "id", lookup_short_id: bool = True):
+    """
+    Busca un archivo por short_id y, si no existe, por UUID.
+
+    Args:
+        cur: Cursor con row_factory=dict_row
+        resource_id: short_id o UUID del archivo
+        columns: Columnas de media_store a devolver
+        lookup_short_id: False si el llamador ya sabe que es un UUID
+
+    Returns:
+        dict | None: Registro encontrado o None
+    """
+    if not PARTITIONED:
+        return _lookup(cur, "media_store", columns, resource_id, lookup_short_id)
+
+    record = _lookup(cur, "media_lookup", "id, created_at", resource_id, lookup_short_id)
+    if not record:
+        return None
+
+    where, params = media_key(record)
+    cur.execute(f"SELECT {columns} FROM media_store WHERE {where}", params)
+    return cur.fetchone()
+
+
 def close_db():
     """Placeholder para compatibilidad"""
     pass
@@ -1,23 +1,40 @@
 import os
+import asyncio
 from contextlib import asynccontextmanager
 from pathlib import Path
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 
+from app import database
 from app.database import init_db, close_db
+from app.partitioning import run_maintenance, MAINTENANCE_INTERVAL_SECONDS
 from app.routers import media
 
 # Cargar .env desde el directorio backend
 env_path = Path(__file__).parent.parent / '.env'
 load_dotenv(dotenv_path=env_path)
 
+async def partition_maintenance_loop():
+    """Pre-crea particiones y aplica la retención periódicamente"""
+    while True:
+        await asyncio.sleep(MAINTENANCE_INTERVAL_SECONDS)
+        try:
+            await asyncio.to_thread(run_maintenance)
+        except Exception as e:
+            print(f"Error en mantenimiento de particiones: {e}")
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     init_db()
+    maintenance_task = None
+    if database.PARTITIONED:
+        maintenance_task = asyncio.create_task(partition_maintenance_loop())
     yield
     # Shutdown
+    if maintenance_task:
+        maintenance_task.cancel()
     close_db()
 
 app = FastAPI(
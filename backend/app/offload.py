@@ -0,0 +1,149 @@
+"""
+Entrega de archivos delegada al proxy inverso (X-Accel-Redirect / X-Sendfile).
+
+Con MEDIA_OFFLOAD_MODE=accel (nginx) o sendfile (Apache/lighttpd) la API sólo
+resuelve el id, comprueba que el archivo exista y devuelve una cabecera que
+apunta a una copia en disco. El proxy envía los bytes con sendfile y el worker
+de uvicorn no toca el contenido.
+
+La copia en disco se materializa desde la base de datos en la primera petición
+y el directorio se mantiene por debajo de MEDIA_CACHE_MAX_MB expulsando los
+archivos usados hace más tiempo (LRU por mtime).
+"""
+import os
+import tempfile
+import time
+from pathlib import Path
+from urllib.parse import quote
+
+from fastapi.responses import Response
+from psycopg.rows import dict_row
+
+from app.database import get_db_connection, media_key
+
+# Configuración
+OFFLOAD_MODE = os.getenv("MEDIA_OFFLOAD_MODE", "").lower()  # "" | accel | sendfile
+CACHE_DIR = Path(os.getenv("MEDIA_CACHE_DIR", "/var/cache/media-to-qr"))
+CACHE_MAX_BYTES = int(os.getenv("MEDIA_CACHE_MAX_MB", 1024)) * 1024 * 1024
+ACCEL_PREFIX = os.getenv("MEDIA_ACCEL_PREFIX", "/_media/")
+# Al superar el límite se expulsa hasta este porcentaje, así la expulsión es rara
+CACHE_LOW_WATERMARK = float(os.getenv("MEDIA_CACHE_LOW_WATERMARK", 0.9))
+# Archivos usados hace menos de esto no se expulsan: el proxy puede estar
+# a punto de abrirlos tras recibir la cabecera de redirección
+CACHE_GRACE_SECONDS = int(os.getenv("MEDIA_CACHE_GRACE_SECONDS", 60))
+
+OFFLOAD_ENABLED = OFFLOAD_MODE in ("accel", "sendfile")
+
+
+def cache_path(file_id) -> Path:
+    """Ruta de la copia en disco de un archivo (nombre = UUID)"""
+    return CACHE_DIR / str(file_id)
+
+
+def materialize(record) -> Path:
+    """
+    Garantiza que el archivo exista en el directorio de caché (bloqueante).
+
+    Si ya está materializado sólo actualiza su mtime para la política LRU.
+    Si no, lo lee de la base de datos y lo escribe de forma atómica.
+
+    Args:
+        record: dict con id (y created_at en el esquema particionado)
+
+    Returns:
+        Path: Ruta del archivo en disco
+    """
+    path = cache_path(record['id'])
+    try:
+        os.utime(path)
+        return path
+    except FileNotFoundError:
+        pass
+
+    where, params = media_key(record)
+    with get_db_connection() as conn:
+        with conn.cursor(row_factory=dict_row) as cur:
+            cur.execute(f"SELECT file_data FROM media_store WHERE {where}", params)
+            row = cur.fetchone()
+    if not row:
+        raise FileNotFoundError(path)
+
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(row['file_data'])
+        os.chmod(tmp_path, 0o644)  # El proxy suele correr con otro usuario
+        os.replace(tmp_path, path)
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+
+    evict()
+    return path
+
+
+def evict(max_bytes: int = CACHE_MAX_BYTES, grace_seconds: int = CACHE_GRACE_SECONDS):
+    """
+    Si la caché supera `max_bytes`, expulsa los archivos menos usados hasta
+    bajar a CACHE_LOW_WATERMARK * max_bytes. Los archivos usados en los
+    últimos `grace_seconds` nunca se expulsan.
+
+    Args:
+        max_bytes: Tamaño máximo del directorio de caché
+        grace_seconds: Antigüedad mínima (por mtime) para poder expulsar
+
+    Returns:
+        int: Número de archivos eliminados
+    """
+    if not CACHE_DIR.exists():
+        return 0
+
+    entries = []
+    total = 0
+    for entry in os.scandir(CACHE_DIR):
+        if not entry.is_file() or entry.name.startswith(".tmp-"):
+            continue
+        try:
+            stat = entry.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, Path(entry.path)))
+        total += stat.st_size
+
+    if total <= max_bytes:
+        return 0
+
+    target = max_bytes * CACHE_LOW_WATERMARK
+    recent = time.time() - grace_seconds
+    removed = 0
+    for mtime, size, path in sorted(entries):
+        if total <= target or mtime >= recent:
+            break  # Ordenado por mtime: el resto es aún más reciente
+        path.unlink(missing_ok=True)
+        total -= size
+        removed += 1
+    return removed
+
+
+def remove_cached(file_id):
+    """Elimina la copia en disco de un archivo borrado"""
+    cache_path(file_id).unlink(missing_ok=True)
+
+
+def offload_response(record, headers: dict = None) -> Response:
+    """
+    Respuesta vacía con la cabecera que indica al proxy qué archivo enviar.
+
+    Args:
+        record: dict con id, content_type y filename
+        headers: Cabeceras adicionales (Cache-Control, etc.)
+    """
+    headers = dict(headers or {})
+    headers.setdefault("Content-Disposition", f'inline; filename="{record["filename"]}"')
+    if OFFLOAD_MODE == "accel":
+        headers["X-Accel-Redirect"] = ACCEL_PREFIX + quote(str(record['id']))
+    else:
+        headers["X-Sendfile"] = str(cache_path(record['id']).resolve())
+
+    return Response(media_type=record['content_type'], headers=headers)
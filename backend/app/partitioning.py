@@ -0,0 +1,369 @@
+"""
+Esquema particionado de media_store (opt-in).
+
+Con MEDIA_PARTITIONING=true, media_store pasa a ser una tabla particionada por
+rango mensual sobre created_at. La resolución short_id/UUID -> (id, created_at)
+se hace en media_lookup, una tabla pequeña sin blobs, y con ese par la consulta
+a media_store toca una sola partición.
+
+La retención se aplica con DETACH/DROP PARTITION en lugar de DELETE fila a fila,
+así no se generan tuplas muertas sobre los BYTEA ni presión de VACUUM.
+
+Uso desde línea de comandos (en el directorio backend):
+    python -m app.partitioning migrate      # Migra la tabla legacy en caliente
+    python -m app.partitioning maintenance  # Crea particiones futuras + retención
+"""
+import os
+import sys
+from datetime import datetime
+
+from psycopg import sql
+from psycopg.rows import dict_row
+
+from app.database import get_db_connection
+
+# Configuración
+PARTITIONING_ENABLED = os.getenv("MEDIA_PARTITIONING", "false").lower() == "true"
+PARTITION_PREMAKE_MONTHS = int(os.getenv("MEDIA_PARTITION_PREMAKE_MONTHS", 3))
+RETENTION_DAYS = int(os.getenv("MEDIA_RETENTION_DAYS", 0))  # 0 = sin retención
+RETENTION_MODE = os.getenv("MEDIA_RETENTION_MODE", "drop").lower()  # drop | detach
+MAINTENANCE_INTERVAL_SECONDS = int(os.getenv("MEDIA_MAINTENANCE_INTERVAL", 3600))
+MIGRATION_BATCH_SIZE = int(os.getenv("MEDIA_MIGRATION_BATCH_SIZE", 200))
+
+PARENT_TABLE = "media_store"
+STAGING_TABLE = "media_store_partitioned"
+LEGACY_TABLE = "media_store_legacy"
+PARTITION_PREFIX = "media_store_p"
+
+# Clave del advisory lock que serializa el mantenimiento entre instancias
+MAINTENANCE_LOCK_ID = 726326
+
+MEDIA_COLUMNS = "id, short_id, file_data, content_type, filename, file_size, access_count, created_at"
+
+
+def partition_name(month_start: datetime) -> str:
+    """Nombre de la partición mensual, p.ej. media_store_p2026_10"""
+    return f"{PARTITION_PREFIX}{month_start:%Y_%m}"
+
+
+def add_months(month_start: datetime, months: int) -> datetime:
+    """Suma meses a un inicio de mes"""
+    month_index = month_start.month - 1 + months
+    return month_start.replace(
+        year=month_start.year + month_index // 12,
+        month=month_index % 12 + 1,
+        day=1, hour=0, minute=0, second=0, microsecond=0
+    )
+
+
+def is_partitioned_table(cur, table: str = PARENT_TABLE) -> bool:
+    """Indica si la tabla existe y está particionada"""
+    cur.execute(
+        "SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)",
+        (table,)
+    )
+    row = cur.fetchone()
+    return bool(row) and row['relkind'] == 'p'
+
+
+def create_partitioned_schema(cur, table: str = PARENT_TABLE):
+    """Crea la tabla padre particionada y la tabla global de lookup"""
+    # La PK debe incluir la clave de partición
+    cur.execute(sql.SQL("""
+        CREATE TABLE IF NOT EXISTS {} (
+            id UUID NOT NULL DEFAULT gen_random_uuid(),
+            short_id VARCHAR(8),
+            file_data BYTEA NOT NULL,
+            content_type VARCHAR(100) NOT NULL,
+            filename VARCHAR(255),
+            file_size BIGINT,
+            access_count INTEGER DEFAULT 0,
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at);
+    """).format(sql.Identifier(table)))
+
+    # Lookup global: filas pequeñas, búsquedas O(1) por short_id o id
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS media_lookup (
+            id UUID PRIMARY KEY,
+            short_id VARCHAR(8) UNIQUE,
+            created_at TIMESTAMP NOT NULL
+        );
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_media_lookup_created_at ON media_lookup(created_at);
+    """)
+
+    # media_lookup se mantiene desde la propia base de datos, así los workers
+    # que aún no detectaron el esquema particionado (p.ej. durante la migración)
+    # siguen registrando sus subidas y la unicidad de short_id se conserva
+    cur.execute("""
+        CREATE OR REPLACE FUNCTION media_lookup_sync() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                INSERT INTO media_lookup (id, short_id, created_at)
+                VALUES (NEW.id, NEW.short_id, NEW.created_at);
+                RETURN NEW;
+            END IF;
+            DELETE FROM media_lookup WHERE id = OLD.id;
+            RETURN OLD;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+    cur.execute(sql.SQL("""
+        CREATE OR REPLACE TRIGGER media_lookup_sync
+        AFTER INSERT OR DELETE ON {}
+        FOR EACH ROW EXECUTE FUNCTION media_lookup_sync();
+    """).format(sql.Identifier(table)))
+
+
+def ensure_partitions(cur, table: str = PARENT_TABLE, since: datetime = None,
+                      months_ahead: int = PARTITION_PREMAKE_MONTHS):
+    """
+    Crea las particiones mensuales desde `since` (o el mes actual) hasta
+    `months_ahead` meses en el futuro. Es idempotente.
+
+    Returns:
+        list[str]: Nombres de las particiones creadas
+    """
+    cur.execute("SELECT date_trunc('month', LOCALTIMESTAMP) AS month_start")
+    current = cur.fetchone()['month_start']
+    start = add_months(since, 0) if since else current
+    end = add_months(current, months_ahead)
+
+    created = []
+    month = start
+    while month <= end:
+        name = partition_name(month) if table == PARENT_TABLE else f"{table}_{month:%Y_%m}"
+        cur.execute("SELECT to_regclass(%s) IS NOT NULL AS present", (name,))
+        present = cur.fetchone()['present']
+        if not present:
+            # DDL no admite parámetros: los límites van como literales.
+            # IF NOT EXISTS evita la carrera entre workers que arrancan a la vez.
+            cur.execute(sql.SQL(
+                "CREATE TABLE IF NOT EXISTS {} PARTITION OF {} FOR VALUES FROM ({}) TO ({})"
+            ).format(
+                sql.Identifier(name), sql.Identifier(table),
+                sql.Literal(month), sql.Literal(add_months(month, 1))
+            ))
+            created.append(name)
+        month = add_months(month, 1)
+    return created
+
+
+def list_partitions(cur):
+    """
+    Lista las particiones mensuales de media_store con sus límites.
+
+    Returns:
+        list[tuple[str, datetime, datetime]]: (nombre, desde, hasta) ordenado por fecha
+    """
+    cur.execute("""
+        SELECT c.relname AS name
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(%s)
+    """, (PARENT_TABLE,))
+    return parse_partitions(row['name'] for row in cur.fetchall())
+
+
+def parse_partitions(names):
+    """
+    Extrae los límites de las particiones mensuales a partir de sus nombres.
+    Ignora las que no siguen el esquema media_store_pYYYY_MM.
+
+    Returns:
+        list[tuple[str, datetime, datetime]]: (nombre, desde, hasta) ordenado por fecha
+    """
+    partitions = []
+    for name in names:
+        if not name.startswith(PARTITION_PREFIX):
+            continue
+        try:
+            month = datetime.strptime(name[len(PARTITION_PREFIX):], "%Y_%m")
+        except ValueError:
+            continue  # Particiones que no gestionamos
+        partitions.append((name, month, add_months(month, 1)))
+    return sorted(partitions, key=lambda p: p[1])
+
+
+def apply_retention(cur, retention_days: int = RETENTION_DAYS, mode: str = RETENTION_MODE):
+    """
+    Elimina las particiones completamente más antiguas que la ventana de
+    retención. Con mode='detach' la partición queda como tabla suelta para
+    archivarla; con 'drop' se elimina.
+
+    Returns:
+        list[str]: Nombres de las particiones retiradas
+    """
+    if retention_days <= 0:
+        return []
+
+    cur.execute(
+        "SELECT LOCALTIMESTAMP - make_interval(days => %s) AS cutoff",
+        (retention_days,)
+    )
+    cutoff = cur.fetchone()['cutoff']
+
+    removed = []
+    for name, start, end in list_partitions(cur):
+        if end > cutoff:
+            break
+        cur.execute(sql.SQL("ALTER TABLE {} DETACH PARTITION {}").format(
+            sql.Identifier(PARENT_TABLE), sql.Identifier(name)))
+        if mode == "drop":
+            cur.execute(sql.SQL("DROP TABLE {}").format(sql.Identifier(name)))
+        cur.execute(
+            "DELETE FROM media_lookup WHERE created_at >= %s AND created_at < %s",
+            (start, end)
+        )
+        removed.append(name)
+    return removed
+
+
+def run_maintenance():
+    """
+    Tarea de mantenimiento: pre-crea particiones y aplica la retención.
+    Sólo una instancia la ejecuta a la vez (advisory lock); el resto no hace nada.
+    """
+    with get_db_connection() as conn:
+        with conn.cursor(row_factory=dict_row) as cur:
+            cur.execute(
+                "SELECT pg_try_advisory_xact_lock(%s) AS locked", (MAINTENANCE_LOCK_ID,)
+            )
+            if not cur.fetchone()['locked']:
+                return {"created": [], "removed": [], "skipped": True}
+            if not is_partitioned_table(cur):
+                return {"created": [], "removed": []}
+            created = ensure_partitions(cur)
+            removed = apply_retention(cur)
+    return {"created": created, "removed": removed}
+
+
+def _copy_batch(cur, after_id, batch_size: int):
+    """Copia un lote de la tabla legacy (ordenado por id) a la tabla particionada"""
+    cur.execute(sql.SQL("""
+        WITH batch AS (
+            SELECT id, short_id, file_data, content_type, filename, file_size,
+                   COALESCE(access_count, 0) AS access_count,
+                   COALESCE(created_at, LOCALTIMESTAMP) AS created_at
+            FROM {legacy}
+            WHERE %s::uuid IS NULL OR id > %s::uuid
+            ORDER BY id
+            LIMIT %s
+        ), copied AS (
+            -- El trigger media_lookup_sync registra cada fila en media_lookup
+            INSERT INTO {staging} ({columns})
+            SELECT {columns} FROM batch
+            ON CONFLICT DO NOTHING
+        )
+        SELECT max(id::text)::uuid AS last_id, count(*) AS copied FROM batch
+    """).format(
+        legacy=sql.Identifier(PARENT_TABLE),
+        staging=sql.Identifier(STAGING_TABLE),
+        columns=sql.SQL(MEDIA_COLUMNS)
+    ), (after_id, after_id, batch_size))
+    row = cur.fetchone()
+    return row['last_id'], row['copied']
+
+
+def migrate_to_partitioned(batch_size: int = MIGRATION_BATCH_SIZE):
+    """
+    Migra en caliente la tabla monolítica media_store al esquema particionado.
+
+    1. Crea media_store_partitioned + particiones desde el archivo más antiguo.
+    2. Copia por lotes (una transacción por lote) sin bloquear la tabla legacy.
+    3. En una transacción final con LOCK EXCLUSIVE (permite lecturas) copia las
+       filas nuevas, descarta las borradas, sincroniza access_count e
+       intercambia los nombres. La tabla antigua queda como media_store_legacy.
+
+    Los workers que siguen en marcha continúan funcionando (el trigger
+    media_lookup_sync registra sus subidas y borrados), pero buscan por
+    short_id sin índice hasta que se reinician y detectan el nuevo esquema.
+    """
+    with get_db_connection() as conn:
+        with conn.cursor(row_factory=dict_row) as cur:
+            if is_partitioned_table(cur):
+                print("media_store ya está particionada, nada que migrar")
+                return
+            cur.execute(sql.SQL(
+                "SELECT date_trunc('month', COALESCE(min(created_at), LOCALTIMESTAMP)) AS oldest FROM {}"
+            ).format(sql.Identifier(PARENT_TABLE)))
+            oldest = cur.fetchone()['oldest']
+            create_partitioned_schema(cur, STAGING_TABLE)
+            ensure_partitions(cur, STAGING_TABLE, since=oldest)
+
+    # Copia por lotes, cada uno en su propia transacción
+    last_id, total = None, 0
+    while True:
+        with get_db_connection() as conn:
+            with conn.cursor(row_factory=dict_row) as cur:
+                batch_last_id, copied = _copy_batch(cur, last_id, batch_size)
+        if not copied:
+            break
+        last_id = batch_last_id
+        total += copied
+        print(f"Copiados {total} archivos...")
+
+    # Corte final: bloquea escrituras sólo durante la reconciliación
+    with get_db_connection() as conn:
+        with conn.cursor(row_factory=dict_row) as cur:
+            cur.execute(sql.SQL("LOCK TABLE {} IN EXCLUSIVE MODE").format(
+                sql.Identifier(PARENT_TABLE)))
+            cur.execute(sql.SQL("""
+                INSERT INTO {staging} ({columns})
+                SELECT id, short_id, file_data, content_type, filename, file_size,
+                       COALESCE(access_count, 0),
+                       COALESCE(created_at, LOCALTIMESTAMP)
+                FROM {legacy} l
+                WHERE NOT EXISTS (SELECT 1 FROM media_lookup m WHERE m.id = l.id)
+            """).format(
+                legacy=sql.Identifier(PARENT_TABLE),
+                staging=sql.Identifier(STAGING_TABLE),
+                columns=sql.SQL(MEDIA_COLUMNS)
+            ))
+            cur.execute(sql.SQL("""
+                DELETE FROM {staging} s
+                WHERE NOT EXISTS (SELECT 1 FROM {legacy} l WHERE l.id = s.id)
+            """).format(
+                legacy=sql.Identifier(PARENT_TABLE),
+                staging=sql.Identifier(STAGING_TABLE)
+            ))
+            cur.execute(sql.SQL("""
+                UPDATE {staging} s
+                SET access_count = COALESCE(l.access_count, 0)
+                FROM {legacy} l
+                WHERE s.id = l.id AND s.access_count IS DISTINCT FROM l.access_count
+            """).format(
+                legacy=sql.Identifier(PARENT_TABLE),
+                staging=sql.Identifier(STAGING_TABLE)
+            ))
+            cur.execute(sql.SQL("ALTER TABLE {} RENAME TO {}").format(
+                sql.Identifier(PARENT_TABLE), sql.Identifier(LEGACY_TABLE)))
+            cur.execute(sql.SQL("ALTER TABLE {} RENAME TO {}").format(
+                sql.Identifier(STAGING_TABLE), sql.Identifier(PARENT_TABLE)))
+            # Renombrar particiones al esquema de nombres definitivo
+            cur.execute("""
+                SELECT c.relname AS name
+                FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+                WHERE i.inhparent = to_regclass(%s)
+            """, (PARENT_TABLE,))
+            for row in cur.fetchall():
+                suffix = row['name'][len(STAGING_TABLE) + 1:]
+                cur.execute(sql.SQL("ALTER TABLE {} RENAME TO {}").format(
+                    sql.Identifier(row['name']),
+                    sql.Identifier(f"{PARTITION_PREFIX}{suffix}")))
+
+    print(f"Migración completada ({total} archivos). Tabla anterior: {LEGACY_TABLE}")
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "maintenance"
+    if command == "migrate":
+        migrate_to_partitioned()
+    elif command == "maintenance":
+        print(run_maintenance())
+    else:
+        print(__doc__)
+        sys.exit(1)
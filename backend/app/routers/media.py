@@ -5,14 +5,18 @@ from fastapi.responses import StreamingResponse, Response
 from io import BytesIO
 from psycopg.rows import dict_row
 
-from app.database import get_db_connection
+from app.database import get_db_connection, find_media, media_key
+from app import offload
 from app.models import MediaFile
+from app.singleflight import SingleFlight
 from app.utils import generate_short_id, is_valid_uuid
-import uuid
 
 router = APIRouter()
 short_router = APIRouter()  # Router sin prefijo para URLs cortas
 
+# Lecturas concurrentes del mismo archivo comparten una sola consulta
+media_flight = SingleFlight()
+
 # Configuración
 MAX_FILE_SIZE = int(os.getenv("MAX_FILE_SIZE", 52428800))  # 50MB default
 
@@ -97,6 +101,79 @@ async def upload_file(request: Request, file: UploadFile = File(...)):
     }
 
 
+def fetch_media(resource_id: str, lookup_short_id: bool = True):
+    """
+    Lee un archivo completo de la base de datos (bloqueante).
+    La resolución del id y la lectura del contenido usan una sola conexión.
+    
+    - **resource_id**: short_id o UUID del archivo
+    - **lookup_short_id**: False si resource_id ya es un UUID
+    - **Returns**: dict con id, created_at, file_data (bytes), content_type, filename o None
+    """
+    with get_db_connection() as conn:
+        with conn.cursor(row_factory=dict_row) as cur:
+            record = find_media(
+                cur, resource_id, "id, created_at, file_data, content_type, filename",
+                lookup_short_id
+            )
+    
+    if record:
+        # Convertir memoryview a bytes una sola vez para todas las peticiones
+        record['file_data'] = bytes(record['file_data'])
+    return record
+
+
+async def load_media(resource_id: str):
+    """
+    Lee un archivo compartiendo la lectura entre peticiones concurrentes.
+    Los UUID se normalizan, así /q/<uuid> y /api/v1/media/<uuid> del mismo
+    archivo comparten lectura; /q/<short_id> usa su propia clave.
+    """
+    lookup_short_id = not is_valid_uuid(resource_id)
+    if not lookup_short_id:
+        try:
+            resource_id = str(UUID(resource_id))
+        except ValueError:
+            return None
+    
+    return await media_flight.do(
+        f"file:{resource_id}", lambda: fetch_media(resource_id, lookup_short_id)
+    )
+
+
+def fetch_media_meta(resource_id: str, lookup_short_id: bool = True):
+    """Lee sólo los metadatos de un archivo, sin el contenido (bloqueante)"""
+    with get_db_connection() as conn:
+        with conn.cursor(row_factory=dict_row) as cur:
+            return find_media(
+                cur, resource_id, "id, created_at, content_type, filename", lookup_short_id
+            )
+
+
+async def offload_media(resource_id: str, background_tasks: BackgroundTasks,
+                        headers: dict = None):
+    """
+    Entrega un archivo delegando el envío de bytes al proxy inverso.
+    Materializa la copia en disco en la primera petición.
+    """
+    lookup_short_id = not is_valid_uuid(resource_id)
+    record = await media_flight.do(
+        f"meta:{resource_id}", lambda: fetch_media_meta(resource_id, lookup_short_id)
+    )
+    
+    if not record:
+        raise HTTPException(status_code=404, detail="Archivo no encontrado")
+    
+    try:
+        await media_flight.do(f"disk:{record['id']}", lambda: offload.materialize(record))
+    except FileNotFoundError:
+        # Eliminado entre la búsqueda y la materialización
+        raise HTTPException(status_code=404, detail="Archivo no encontrado")
+    
+    background_tasks.add_task(increment_access_count, record['id'], record['created_at'])
+    return offload.offload_response(record, headers)
+
+
 @short_router.get("/q/{resource_id}")
 async def get_media_short(resource_id: str, background_tasks: BackgroundTasks):
     """
@@ -106,42 +183,22 @@ async def get_media_short(resource_id: str, background_tasks: BackgroundTasks):
     - **Returns**: Response con el archivo binario o 404
     """
     
-    with get_db_connection() as conn:
-        with conn.cursor(row_factory=dict_row) as cur:
-            # Intentar buscar por short_id primero
-            cur.execute(
-                "SELECT id, file_data, content_type, filename FROM media_store WHERE short_id = %s",
-                (resource_id,)
-            )
-            record = cur.fetchone()
-            
-            # Fallback: buscar por UUID si el formato es válido
-            if not record and is_valid_uuid(resource_id):
-                try:
-                    file_uuid = uuid.UUID(resource_id)
-                    cur.execute(
-                        "SELECT id, file_data, content_type, filename FROM media_store WHERE id = %s",
-                        (file_uuid,)
-                    )
-                    record = cur.fetchone()
-                except ValueError:
-                    pass
-            
-            if not record:
-                raise HTTPException(status_code=404, detail="Archivo no encontrado")
-            
-            file_id = record['id']
-            file_data = record['file_data']
-            content_type = record['content_type']
-            filename = record['filename']
+    if offload.OFFLOAD_ENABLED:
+        return await offload_media(resource_id, background_tasks)
+    
+    # Buscar por short_id primero, UUID como fallback (lectura compartida)
+    record = await load_media(resource_id)
+    
+    if not record:
+        raise HTTPException(status_code=404, detail="Archivo no encontrado")
     
     # Incrementar contador en segundo plano
-    background_tasks.add_task(increment_access_count, file_id)
+    background_tasks.add_task(increment_access_count, record['id'], record['created_at'])
     
     return Response(
-        content=bytes(file_data),
-        media_type=content_type,
-        headers={"Content-Disposition": f"inline; filename={filename}"}
+        content=record['file_data'],
+        media_type=record['content_type'],
+        headers={"Content-Disposition": f"inline; filename={record['filename']}"}
     )
 
 
@@ -155,18 +212,14 @@ async def get_media(file_id: UUID, background_tasks: BackgroundTasks):
     - **Returns**: StreamingResponse con el archivo binario o mensaje de error
     """
     
-    # Buscar archivo en base de datos
-    with get_db_connection() as conn:
-        with conn.cursor(row_factory=dict_row) as cur:
-            cur.execute(
-                """
-                SELECT file_data, content_type, filename
-                FROM media_store
-                WHERE id = %s
-                """,
-                (file_id,)
-            )
-            record = cur.fetchone()
+    if offload.OFFLOAD_ENABLED:
+        return await offload_media(
+            str(file_id), background_tasks,
+            {"Cache-Control": "public, max-age=31536000"}
+        )
+    
+    # Buscar archivo en base de datos (lectura compartida entre peticiones concurrentes)
+    record = await load_media(str(file_id))
     
     if not record:
         raise HTTPException(
@@ -175,11 +228,10 @@ async def get_media(file_id: UUID, background_tasks: BackgroundTasks):
         )
     
     # Incrementar contador en segundo plano (no bloquea la respuesta)
-    background_tasks.add_task(increment_access_count, file_id)
+    background_tasks.add_task(increment_access_count, record['id'], record['created_at'])
     
-    # Crear stream del archivo (convertir memoryview a bytes si es necesario)
-    file_data_bytes = bytes(record['file_data'])
-    file_stream = BytesIO(file_data_bytes)
+    # Crear stream del archivo
+    file_stream = BytesIO(record['file_data'])
     
     # Configurar headers para reproducción en navegador
     headers = {
@@ -195,18 +247,19 @@ async def get_media(file_id: UUID, background_tasks: BackgroundTasks):
     )
 
 
-def increment_access_count(file_id: UUID):
+def increment_access_count(file_id: UUID, created_at=None):
     """Incrementa el contador de accesos en segundo plano"""
     try:
+        where, params = media_key({'id': file_id, 'created_at': created_at})
         with get_db_connection() as conn:
             with conn.cursor() as cur:
                 cur.execute(
-                    """
+                    f"""
                     UPDATE media_store 
                     SET access_count = access_count + 1 
-                    WHERE id = %s
+                    WHERE {where}
                     """,
-                    (file_id,)
+                    params
                 )
     except Exception as e:
         # Log error pero no afecta la entrega del contenido
@@ -238,6 +291,16 @@ async def get_stats():
     }
 
 
+@router.get("/stats/coalescing")
+async def get_coalescing_stats():
+    """
+    Métricas de coalescencia de lecturas de archivos (por worker).
+    
+    - **Returns**: JSON con lecturas reales, peticiones coalescidas y desbordes
+    """
+    return media_flight.stats()
+
+
 @router.get("/storage")
 async def get_storage_info():
     """
@@ -276,30 +339,11 @@ async def get_media_info(file_id: str):
     """
     with get_db_connection() as conn:
         with conn.cursor(row_factory=dict_row) as cur:
-            # Intentar buscar por short_id primero
-            cur.execute(
-                """
-                SELECT id, short_id, content_type, filename, file_size, access_count, created_at
-                FROM media_store WHERE short_id = %s
-                """,
-                (file_id,)
+            # Buscar por short_id primero, UUID como fallback
+            record = find_media(
+                cur, file_id,
+                "id, short_id, content_type, filename, file_size, access_count, created_at"
             )
-            record = cur.fetchone()
-            
-            # Fallback: buscar por UUID si el formato es válido
-            if not record and is_valid_uuid(file_id):
-                try:
-                    file_uuid = uuid.UUID(file_id)
-                    cur.execute(
-                        """
-                        SELECT id, short_id, content_type, filename, file_size, access_count, created_at
-                        FROM media_store WHERE id = %s
-                        """,
-                        (file_uuid,)
-                    )
-                    record = cur.fetchone()
-                except ValueError:
-                    pass
     
     if not record:
         raise HTTPException(status_code=404, detail="Archivo no encontrado")
@@ -326,35 +370,18 @@ async def delete_media(file_id: str):
     
     with get_db_connection() as conn:
         with conn.cursor(row_factory=dict_row) as cur:
-            # Intentar buscar por short_id primero
-            cur.execute(
-                "SELECT id FROM media_store WHERE short_id = %s",
-                (file_id,)
-            )
-            record = cur.fetchone()
-            
-            # Fallback: buscar por UUID si el formato es válido
-            if not record and is_valid_uuid(file_id):
-                try:
-                    file_uuid = uuid.UUID(file_id)
-                    cur.execute(
-                        "SELECT id FROM media_store WHERE id = %s",
-                        (file_uuid,)
-                    )
-                    record = cur.fetchone()
-                except ValueError:
-                    pass
+            # Buscar por short_id primero, UUID como fallback
+            record = find_media(cur, file_id, "id, created_at")
             
             if not record:
                 raise HTTPException(status_code=404, detail="Archivo no encontrado")
             
-            db_file_id = record['id']
-            
             # Eliminar
-            cur.execute(
-                "DELETE FROM media_store WHERE id = %s",
-                (db_file_id,)
-            )
+            where, params = media_key(record)
+            cur.execute(f"DELETE FROM media_store WHERE {where}", params)
+    
+    if offload.OFFLOAD_ENABLED:
+        offload.remove_cached(record['id'])
     
     return {"message": "Archivo eliminado exitosamente", "id": str(file_id)}
 
@@ -371,6 +398,14 @@ async def cleanup_all():
             cur.execute("SELECT COUNT(*) as count FROM media_store")
             count = cur.fetchone()['count']
             
-            cur.execute("TRUNCATE TABLE media_store")
+            # TRUNCATE no dispara el trigger de media_lookup: se vacía aparte
+            cur.execute("SELECT to_regclass('media_lookup') IS NOT NULL AS has_lookup")
+            if cur.fetchone()['has_lookup']:
+                cur.execute("TRUNCATE TABLE media_store, media_lookup")
+            else:
+                cur.execute("TRUNCATE TABLE media_store")
+    
+    if offload.OFFLOAD_ENABLED:
+        offload.evict(max_bytes=0, grace_seconds=0)
     
     return {"message": f"Se eliminaron {count} archivos", "count": count}
@@ -0,0 +1,75 @@
+"""
+Coalescencia de peticiones (single-flight).
+
+Cuando muchos clientes piden el mismo archivo a la vez (p.ej. un QR en una
+pantalla escaneado por cientos de móviles), sólo la primera petición lanza la
+lectura a la base de datos; el resto espera ese mismo resultado.
+"""
+import asyncio
+import os
+from typing import Any, Callable, Dict
+
+MAX_WAITERS_PER_KEY = int(os.getenv("SINGLEFLIGHT_MAX_WAITERS", 1000))
+
+
+class SingleFlight:
+    """Agrupa llamadas concurrentes con la misma clave en una sola ejecución"""
+
+    def __init__(self, max_waiters: int = MAX_WAITERS_PER_KEY):
+        self.max_waiters = max_waiters
+        self._flights: Dict[str, asyncio.Future] = {}
+        self._waiters: Dict[str, int] = {}
+        self.fetches = 0     # Lecturas reales ejecutadas
+        self.coalesced = 0   # Peticiones servidas por una lectura en curso
+        self.overflow = 0    # Lecturas nuevas iniciadas por superar el límite de esperas
+
+    async def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        """
+        Ejecuta `fn` en un hilo, o espera el resultado si ya hay una
+        ejecución en curso para `key`.
+
+        Args:
+            key: Identificador del recurso
+            fn: Función bloqueante que produce el resultado
+
+        Returns:
+            Resultado de `fn` (compartido entre todas las peticiones)
+        """
+        flight = self._flights.get(key)
+
+        if flight is not None and self._waiters[key] < self.max_waiters:
+            self._waiters[key] += 1
+            self.coalesced += 1
+            # shield: si un cliente cancela no se cancela la lectura compartida
+            return await asyncio.shield(flight)
+
+        if flight is not None:
+            # Límite alcanzado: nueva lectura compartida a la que se unen
+            # las siguientes peticiones
+            self.overflow += 1
+
+        # La lectura corre en su propia tarea para sobrevivir a la
+        # desconexión del cliente que la inició
+        flight = asyncio.ensure_future(asyncio.to_thread(fn))
+        self._flights[key] = flight
+        self._waiters[key] = 0
+        self.fetches += 1
+        flight.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(flight)
+
+    def _finish(self, key: str, flight: asyncio.Future):
+        """Libera la clave al terminar la lectura, salvo que ya la ocupe otra"""
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+            del self._waiters[key]
+
+    def stats(self) -> dict:
+        """Métricas de coalescencia"""
+        requests = self.fetches + self.coalesced
+        return {
+            "fetches": self.fetches,
+            "coalesced": self.coalesced,
+            "overflow": self.overflow,
+            "in_flight": len(self._flights),
+            "coalesced_ratio": round(self.coalesced / requests, 4) if requests else 0
+        }
@@ -43,9 +43,8 @@ def is_valid_uuid(value: str) -> bool:
         if len(part) != expected_len:
             return False
         # Verificar que solo contiene caracteres hexadecimales
-        try:
-            int(part, 16)
-        except ValueError:
+        # (int(part, 16) aceptaría '0x', espacios y '_', que uuid.UUID rechaza)
+        if not all(c in string.hexdigits for c in part):
             return False
     
     return True
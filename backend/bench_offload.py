@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Benchmark - CPU del worker de uvicorn por archivo entregado
+
+Ejecutar una vez con el modo por defecto y otra con MEDIA_OFFLOAD_MODE=accel
+detrás de nginx (ver nginx.conf.example) y comparar el CPU por petición.
+
+Uso:
+    python bench_offload.py http://localhost:8080 <short_id> --pid <pid_worker>
+    python bench_offload.py http://localhost:8080 <short_id> --pid 1234 -n 500 -c 20
+
+--pid es el PID del proceso uvicorn (Linux, se lee /proc/<pid>/stat).
+"""
+
+import argparse
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+def process_cpu_seconds(pid):
+    """CPU (user + system) consumido por un proceso, en segundos"""
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    # utime y stime son los campos 14 y 15 (índices 11 y 12 tras el nombre)
+    ticks = int(fields[11]) + int(fields[12])
+    return ticks / os.sysconf("SC_CLK_TCK")
+
+
+_local = threading.local()
+
+
+def fetch(url):
+    """Descarga el archivo completo y devuelve los bytes recibidos"""
+    # Una sesión por hilo: requests.Session no es thread-safe
+    if not hasattr(_local, "session"):
+        _local.session = requests.Session()
+    response = _local.session.get(url)
+    response.raise_for_status()
+    return len(response.content)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("base_url")
+    parser.add_argument("short_id")
+    parser.add_argument("--pid", type=int, required=True, help="PID del worker uvicorn")
+    parser.add_argument("-n", "--requests", type=int, default=200)
+    parser.add_argument("-c", "--concurrency", type=int, default=10)
+    args = parser.parse_args()
+
+    url = f"{args.base_url.rstrip('/')}/q/{args.short_id}"
+
+    # Calentamiento: materializa el archivo en modo offload
+    size = fetch(url)
+    print(f"🎯 {url} ({size / 1024 / 1024:.2f} MB)")
+
+    cpu_start = process_cpu_seconds(args.pid)
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        total_bytes = sum(pool.map(lambda _: fetch(url), range(args.requests)))
+    wall = time.perf_counter() - wall_start
+    cpu = process_cpu_seconds(args.pid) - cpu_start
+
+    print(f"📊 {args.requests} peticiones, concurrencia {args.concurrency}")
+    print(f"   Tiempo total:     {wall:.2f} s ({args.requests / wall:.1f} req/s)")
+    print(f"   Transferido:      {total_bytes / 1024 / 1024:.1f} MB")
+    print(f"   CPU del worker:   {cpu:.2f} s")
+    print(f"   CPU por petición: {cpu / args.requests * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
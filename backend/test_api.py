@@ -60,6 +60,18 @@ def test_download(base_url, file_id):
     
     return True
 
+def test_invalid_uuid(base_url):
+    """Test malformed UUID-like ids return 404 (not 500)"""
+    print(f"\n🚫 Testing malformed ids...")
+    
+    for resource_id in ("0x345678-0x34-1234-1234-123456789012",
+                        "1234567%20-1234-1234-1234-123456789012"):
+        response = requests.get(f"{base_url}/q/{resource_id}")
+        assert response.status_code == 404, f"{resource_id}: {response.status_code}"
+    
+    print(f"✅ Malformed ids return 404")
+    return True
+
 def test_stats(base_url):
     """Test stats endpoint"""
     print(f"\n📊 Testing stats endpoint...")
@@ -78,6 +90,24 @@ def test_stats(base_url):
     
     return True
 
+def test_coalescing_stats(base_url):
+    """Test coalescing metrics endpoint"""
+    print(f"\n🔀 Testing coalescing stats endpoint...")
+    
+    response = requests.get(f"{base_url}/api/v1/stats/coalescing")
+    
+    if response.status_code != 200:
+        print(f"❌ Coalescing stats failed: {response.text}")
+        return False
+    
+    data = response.json()
+    print(f"✅ Coalescing stats retrieved")
+    print(f"   Fetches: {data['fetches']}")
+    print(f"   Coalesced: {data['coalesced']}")
+    print(f"   Overflow: {data['overflow']}")
+    
+    return True
+
 def main():
     if len(sys.argv) < 2:
         print("Usage: python test_api.py <base_url>")
@@ -102,9 +132,15 @@ def main():
         # 3. Download file
         test_download(base_url, upload_data['id'])
         
-        # 4. Stats
+        # 4. Malformed ids
+        test_invalid_uuid(base_url)
+        
+        # 5. Stats
         test_stats(base_url)
         
+        # 6. Coalescing stats
+        test_coalescing_stats(base_url)
+        
         print("\n" + "=" * 50)
         print("✅ All tests passed!")
         
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Test Script - Caché en disco del modo offload (X-Accel-Redirect / X-Sendfile)
+
+No necesita servidor ni base de datos: usa un directorio temporal como caché.
+
+Uso:
+    python test_offload.py
+    python -m pytest test_offload.py
+"""
+
+import os
+import sys
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+from app import offload
+
+KB = 1024
+
+
+@contextmanager
+def temp_cache(**settings):
+    """Apunta offload a un directorio temporal y restaura la configuración"""
+    settings.setdefault("CACHE_LOW_WATERMARK", 0.9)
+    originals = {name: getattr(offload, name) for name in settings}
+    original_dir = offload.CACHE_DIR
+    with tempfile.TemporaryDirectory() as tmp:
+        offload.CACHE_DIR = Path(tmp)
+        for name, value in settings.items():
+            setattr(offload, name, value)
+        try:
+            yield Path(tmp)
+        finally:
+            offload.CACHE_DIR = original_dir
+            for name, value in originals.items():
+                setattr(offload, name, value)
+
+
+def add_file(cache_dir, name, size, age):
+    """Crea un archivo de `size` bytes usado hace `age` segundos"""
+    path = cache_dir / name
+    path.write_bytes(b"x" * size)
+    mtime = time.time() - age
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def names(cache_dir):
+    return sorted(p.name for p in cache_dir.iterdir())
+
+
+def test_no_eviction_under_limit():
+    """Nothing is removed while the cache is within max_bytes"""
+    print("🔍 Testing no eviction under limit...")
+    with temp_cache() as cache_dir:
+        for i in range(4):
+            add_file(cache_dir, f"f{i}", 100 * KB, age=1000 + i)
+        assert offload.evict(max_bytes=400 * KB, grace_seconds=0) == 0
+        assert len(names(cache_dir)) == 4
+    print("✅ No eviction under limit passed")
+
+
+def test_evicts_oldest_down_to_watermark():
+    """Oldest files go first and eviction stops at the low watermark"""
+    print("\n🔍 Testing LRU eviction to low watermark...")
+    with temp_cache(CACHE_LOW_WATERMARK=0.5) as cache_dir:
+        # f0 es el más antiguo
+        for i in range(10):
+            add_file(cache_dir, f"f{i}", 100 * KB, age=1000 - i)
+        # 1000 KB > 900 KB -> bajar hasta 450 KB: quedan 4 archivos
+        removed = offload.evict(max_bytes=900 * KB, grace_seconds=0)
+        assert removed == 6
+        assert names(cache_dir) == ["f6", "f7", "f8", "f9"]
+    print("✅ LRU eviction to low watermark passed")
+
+
+def test_grace_window_is_never_evicted():
+    """Recently used files survive even when the cache is over the limit"""
+    print("\n🔍 Testing grace window...")
+    with temp_cache() as cache_dir:
+        add_file(cache_dir, "old", 100 * KB, age=1000)
+        add_file(cache_dir, "recent1", 100 * KB, age=5)
+        add_file(cache_dir, "recent2", 100 * KB, age=1)
+        removed = offload.evict(max_bytes=50 * KB, grace_seconds=60)
+        assert removed == 1
+        assert names(cache_dir) == ["recent1", "recent2"]
+    print("✅ Grace window passed")
+
+
+def test_tmp_files_skipped():
+    """In-progress .tmp-* files are neither counted nor removed"""
+    print("\n🔍 Testing .tmp- files are skipped...")
+    with temp_cache() as cache_dir:
+        add_file(cache_dir, ".tmp-abc", 1000 * KB, age=1000)
+        add_file(cache_dir, "f0", 100 * KB, age=1000)
+        assert offload.evict(max_bytes=200 * KB, grace_seconds=0) == 0
+        assert offload.evict(max_bytes=0, grace_seconds=0) == 1
+        assert names(cache_dir) == [".tmp-abc"]
+    print("✅ .tmp- files skipped passed")
+
+
+def test_evict_all():
+    """evict(max_bytes=0, grace_seconds=0) empties the cache (cleanup_all)"""
+    print("\n🔍 Testing full eviction...")
+    with temp_cache() as cache_dir:
+        for i in range(3):
+            add_file(cache_dir, f"f{i}", 10 * KB, age=0)
+        assert offload.evict(max_bytes=0, grace_seconds=0) == 3
+        assert names(cache_dir) == []
+    print("✅ Full eviction passed")
+
+
+def test_materialize_cached_hit():
+    """An already materialized file is returned and its mtime refreshed"""
+    print("\n🔍 Testing materialize cache hit...")
+    with temp_cache() as cache_dir:
+        file_id = uuid.uuid4()
+        path = add_file(cache_dir, str(file_id), 10 * KB, age=1000)
+        assert offload.materialize({"id": file_id, "created_at": None}) == path
+        assert time.time() - path.stat().st_mtime < 5
+    print("✅ Materialize cache hit passed")
+
+
+def test_offload_response_headers():
+    """accel points at ACCEL_PREFIX + id, sendfile at an absolute path"""
+    print("\n🔍 Testing offload response headers...")
+    file_id = uuid.uuid4()
+    record = {"id": file_id, "content_type": "video/mp4", "filename": "a.mp4"}
+
+    with temp_cache(OFFLOAD_MODE="accel", ACCEL_PREFIX="/_media/"):
+        response = offload.offload_response(record, {"Cache-Control": "public"})
+        assert response.headers["x-accel-redirect"] == f"/_media/{file_id}"
+        assert "x-sendfile" not in response.headers
+        assert response.headers["content-type"] == "video/mp4"
+        assert response.headers["cache-control"] == "public"
+        assert response.body == b""
+
+    with temp_cache(OFFLOAD_MODE="sendfile") as cache_dir:
+        response = offload.offload_response(record)
+        sendfile = Path(response.headers["x-sendfile"])
+        assert sendfile.is_absolute()
+        assert sendfile == (cache_dir / str(file_id)).resolve()
+        assert "x-accel-redirect" not in response.headers
+    print("✅ Offload response headers passed")
+
+
+def main():
+    print("🚀 Testing offload cache\n")
+    print("=" * 50)
+
+    try:
+        test_no_eviction_under_limit()
+        test_evicts_oldest_down_to_watermark()
+        test_grace_window_is_never_evicted()
+        test_tmp_files_skipped()
+        test_evict_all()
+        test_materialize_cached_hit()
+        test_offload_response_headers()
+
+        print("\n" + "=" * 50)
+        print("✅ All tests passed!")
+
+    except AssertionError as e:
+        print(f"\n❌ Assertion failed: {e!r}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Test Script - Particionado (funciones puras)
+
+No necesita servidor ni base de datos.
+
+Uso:
+    python test_partitioning.py
+    python -m pytest test_partitioning.py
+"""
+
+import sys
+from datetime import datetime
+
+from app.partitioning import add_months, list_partitions, partition_name
+
+
+class FakeCursor:
+    """Cursor mínimo que devuelve filas fijas (dict_row)"""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def execute(self, query, params=None):
+        pass
+
+    def fetchall(self):
+        return self.rows
+
+
+def test_add_months_rollover():
+    """December + 1 rolls over to January of the next year"""
+    print("🔍 Testing add_months rollover...")
+    assert add_months(datetime(2026, 12, 1), 1) == datetime(2027, 1, 1)
+    assert add_months(datetime(2026, 11, 1), 14) == datetime(2028, 1, 1)
+    assert add_months(datetime(2026, 10, 1), 0) == datetime(2026, 10, 1)
+    # Normaliza al inicio de mes
+    assert add_months(datetime(2026, 10, 19, 13, 45), 0) == datetime(2026, 10, 1)
+    print("✅ add_months rollover passed")
+
+
+def test_add_months_negative():
+    """Negative offsets go back across year boundaries"""
+    print("\n🔍 Testing add_months negative offsets...")
+    assert add_months(datetime(2026, 1, 1), -1) == datetime(2025, 12, 1)
+    assert add_months(datetime(2026, 3, 1), -15) == datetime(2024, 12, 1)
+    assert add_months(datetime(2026, 10, 1), -12) == datetime(2025, 10, 1)
+    print("✅ add_months negative offsets passed")
+
+
+def test_partition_name():
+    """Partition names use a zero-padded month"""
+    print("\n🔍 Testing partition_name...")
+    assert partition_name(datetime(2026, 3, 1)) == "media_store_p2026_03"
+    assert partition_name(datetime(2026, 12, 1)) == "media_store_p2026_12"
+    print("✅ partition_name passed")
+
+
+def test_list_partitions_skips_foreign_names():
+    """Only media_store_pYYYY_MM partitions are listed, sorted by month"""
+    print("\n🔍 Testing list_partitions...")
+    cur = FakeCursor([
+        {"name": "media_store_p2026_11"},
+        {"name": "media_store_default"},
+        {"name": "media_store_p2026_12"},
+        {"name": "media_store_partitioned_2026_10"},
+        {"name": "archive_2026_09"},
+        {"name": "media_store_p2026_13"},
+        {"name": "media_store_p2025_12"},
+    ])
+    partitions = list_partitions(cur)
+    assert [p[0] for p in partitions] == [
+        "media_store_p2025_12", "media_store_p2026_11", "media_store_p2026_12"
+    ]
+    assert partitions[0][1:] == (datetime(2025, 12, 1), datetime(2026, 1, 1))
+    assert partitions[2][1:] == (datetime(2026, 12, 1), datetime(2027, 1, 1))
+    print("✅ list_partitions passed")
+
+
+def main():
+    print("🚀 Testing partitioning helpers\n")
+    print("=" * 50)
+
+    try:
+        test_add_months_rollover()
+        test_add_months_negative()
+        test_partition_name()
+        test_list_partitions_skips_foreign_names()
+
+        print("\n" + "=" * 50)
+        print("✅ All tests passed!")
+
+    except AssertionError as e:
+        print(f"\n❌ Assertion failed: {e!r}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Test Script - SingleFlight (coalescencia de lecturas)
+
+No necesita servidor ni base de datos.
+
+Uso:
+    python test_singleflight.py
+    python -m pytest test_singleflight.py
+"""
+
+import asyncio
+import sys
+import threading
+import time
+
+from app.singleflight import SingleFlight
+
+
+class SlowFetch:
+    """Función bloqueante que cuenta sus ejecuciones"""
+
+    def __init__(self, result=b"data", delay=0.1, error=None):
+        self.result = result
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return self.result
+
+
+def test_coalescing():
+    """Concurrent calls for the same key share one fetch"""
+    print("🔍 Testing coalescing...")
+
+    async def run():
+        flight = SingleFlight(max_waiters=100)
+        fetch = SlowFetch()
+        results = await asyncio.gather(*[flight.do("a", fetch) for _ in range(50)])
+        assert fetch.calls == 1
+        assert all(r is results[0] for r in results)
+        assert flight.fetches == 1
+        assert flight.coalesced == 49
+
+    asyncio.run(run())
+    print("✅ Coalescing passed")
+
+
+def test_waiter_cap():
+    """Requests beyond the cap start a new shared fetch instead of one each"""
+    print("\n🔍 Testing waiter cap...")
+
+    async def run():
+        flight = SingleFlight(max_waiters=10)
+        fetch = SlowFetch()
+        results = await asyncio.gather(*[flight.do("a", fetch) for _ in range(25)])
+        # 1 + 10 esperas, 1 + 10 esperas, 1 + 2 esperas
+        assert fetch.calls == 3
+        assert flight.overflow == 2
+        assert flight.coalesced == 22
+        assert all(r == b"data" for r in results)
+
+    asyncio.run(run())
+    print("✅ Waiter cap passed")
+
+
+def test_exception_reaches_all_waiters():
+    """An error in the shared fetch is raised to every waiter"""
+    print("\n🔍 Testing exception fan-out...")
+
+    async def run():
+        flight = SingleFlight()
+        fetch = SlowFetch(error=KeyError("boom"))
+        results = await asyncio.gather(
+            *[flight.do("a", fetch) for _ in range(5)], return_exceptions=True
+        )
+        assert fetch.calls == 1
+        assert all(isinstance(r, KeyError) for r in results)
+
+    asyncio.run(run())
+    print("✅ Exception fan-out passed")
+
+
+def test_key_released():
+    """The key is freed once the fetch finishes, so later calls fetch again"""
+    print("\n🔍 Testing key release...")
+
+    async def run():
+        flight = SingleFlight()
+        fetch = SlowFetch(delay=0.01)
+        await flight.do("a", fetch)
+        assert flight.stats()["in_flight"] == 0
+        await flight.do("a", fetch)
+        assert fetch.calls == 2
+
+        failing = SlowFetch(delay=0.01, error=ValueError("x"))
+        try:
+            await flight.do("b", failing)
+        except ValueError:
+            pass
+        assert flight.stats()["in_flight"] == 0
+
+    asyncio.run(run())
+    print("✅ Key release passed")
+
+
+def main():
+    print("🚀 Testing SingleFlight\n")
+    print("=" * 50)
+
+    try:
+        test_coalescing()
+        test_waiter_cap()
+        test_exception_reaches_all_waiters()
+        test_key_released()
+
+        print("\n" + "=" * 50)
+        print("✅ All tests passed!")
+
+    except AssertionError as e:
+        print(f"\n❌ Assertion failed: {e!r}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Test Script - Utilidades (short_id y validación de UUID)
+
+No necesita servidor ni base de datos.
+
+Uso:
+    python test_utils.py
+    python -m pytest test_utils.py
+"""
+
+import sys
+import uuid
+
+from app.utils import BASE62_ALPHABET, generate_short_id, is_valid_uuid
+
+
+def test_valid_uuids():
+    """Canonical UUIDs are accepted in any case"""
+    print("🔍 Testing valid UUIDs...")
+    value = str(uuid.uuid4())
+    assert is_valid_uuid(value)
+    assert is_valid_uuid(value.upper())
+    print("✅ Valid UUIDs passed")
+
+
+def test_malformed_uuids():
+    """Anything uuid.UUID would reject is not a valid UUID"""
+    print("\n🔍 Testing malformed UUIDs...")
+    for value in (
+        "0x345678-0x34-1234-1234-123456789012",  # prefijo 0x
+        "1234567 -1234-1234-1234-123456789012",  # espacio
+        "1234_678-1234-1234-1234-123456789012",  # guion bajo
+        "+1234567-1234-1234-1234-123456789012",  # signo
+        "g2345678-1234-1234-1234-123456789012",  # no hexadecimal
+        "12345678-1234-1234-1234-1234567890123",  # longitud
+        "Ab3d9Z",                                # short_id
+    ):
+        assert not is_valid_uuid(value), value
+    print("✅ Malformed UUIDs passed")
+
+
+def test_short_id():
+    """Short ids use the Base62 alphabet and the requested length"""
+    print("\n🔍 Testing short ids...")
+    short_id = generate_short_id(6)
+    assert len(short_id) == 6
+    assert all(c in BASE62_ALPHABET for c in short_id)
+    assert not is_valid_uuid(short_id)
+    print("✅ Short ids passed")
+
+
+def main():
+    print("🚀 Testing utils\n")
+    print("=" * 50)
+
+    try:
+        test_valid_uuids()
+        test_malformed_uuids()
+        test_short_id()
+
+        print("\n" + "=" * 50)
+        print("✅ All tests passed!")
+
+    except AssertionError as e:
+        print(f"\n❌ Assertion failed: {e!r}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()